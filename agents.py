@@ -1,8 +1,8 @@
 import os
 import json
 import re
+import threading
 from typing import Dict, List, Optional
-from openai import OpenAI
 
 # --- Agent Configuration ---
 # OpenRouter Model ID (Using valid Gemini Flash model)
@@ -12,11 +12,24 @@ EXTRACTION_MODEL = "google/gemini-2.0-flash-exp:free"
 
 class BaseAgent:
     def __init__(self, api_key: str, model_name: str):
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
+        self.api_key = api_key
         self.model_name = model_name
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI client, built (and the SDK imported) on first use."""
+        if self._client is None:
+            # Lifespan warm-up and early requests may race to build it
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        base_url="https://openrouter.ai/api/v1",
+                        api_key=self.api_key,
+                    )
+        return self._client
 
 class OrchestratorAgent(BaseAgent):
     def __init__(self, api_key: str):
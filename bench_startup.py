@@ -0,0 +1,61 @@
+import sys
+import time
+import subprocess
+import requests
+
+# Startup benchmark: import time of main.py, then time to the first served
+# request under the same gunicorn --preload command as entrypoint.sh.
+# "First honeypot reply" goes through the agents, so it includes the lazy
+# OpenAI import / client construction (and the model call itself).
+PORT = 8199
+WORKERS = 4
+RUNS = 3
+
+GUNICORN_CMD = [
+    sys.executable, "-m", "gunicorn", "--preload", "-w", str(WORKERS),
+    "-k", "uvicorn.workers.UvicornWorker", "-b", f"127.0.0.1:{PORT}", "main:app",
+]
+
+def measure_import() -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def measure_first_requests():
+    """Returns (seconds to first GET /, seconds to first POST /guvi-honeypot reply)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(GUNICORN_CMD, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                requests.get(f"http://127.0.0.1:{PORT}/", timeout=1).raise_for_status()
+                first_get = time.perf_counter() - start
+                break
+            except Exception:
+                if proc.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                time.sleep(0.01)
+        resp = requests.post(
+            f"http://127.0.0.1:{PORT}/guvi-honeypot",
+            json={"message": "Hello madam", "client_id": "bench-startup"},
+            timeout=120,
+        )
+        resp.raise_for_status()
+        first_post = time.perf_counter() - start
+        return first_get, first_post
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def run_benchmark():
+    print(f"--- Startup Benchmark ({RUNS} runs, gunicorn --preload -w {WORKERS}) ---")
+    imports = [measure_import() for _ in range(RUNS)]
+    firsts = [measure_first_requests() for _ in range(RUNS)]
+    gets = [f[0] for f in firsts]
+    posts = [f[1] for f in firsts]
+    print(f"Import main.py:        best {min(imports) * 1000:.0f} ms, avg {sum(imports) / RUNS * 1000:.0f} ms")
+    print(f"First GET /:           best {min(gets) * 1000:.0f} ms, avg {sum(gets) / RUNS * 1000:.0f} ms")
+    print(f"First honeypot reply:  best {min(posts) * 1000:.0f} ms, avg {sum(posts) / RUNS * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,2 +1,10 @@
 #!/bin/bash
-gunicorn -w 4 -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8000 main:app
+if [ -n "$SHARD_COUNT" ]; then
+    # Single host, one shard process per core (see run_cluster.py)
+    exec python run_cluster.py --shards "$SHARD_COUNT" --base-port 8000
+elif [ -n "$SHARD_NODES" ]; then
+    # One shard of a multi-node cluster; SHARD_ID selects this node's entry
+    exec uvicorn main:app --host 0.0.0.0 --port "${PORT:-8000}"
+else
+    gunicorn --preload -w 4 -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8000 main:app
+fi
@@ -0,0 +1,498 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+# --- Intel Pipeline Configuration ---
+# INTEL_SINK: where enriched batches are exported.
+#   "file:<path>"  -> append JSON lines to a local file (default: file:intel_export.jsonl)
+#   "http(s)://..." -> POST each batch as JSON (see mock_sink.py for a local stand-in)
+BATCH_SIZE = 500
+# Export failures are retried indefinitely; only malformed input is terminal
+RETRY_BASE_DELAY = 2  # seconds, doubled on every failed attempt
+MAX_RETRY_DELAY = 300  # backoff cap, seconds
+CLUSTER_BATCH_SIZE = 5000  # sightings folded into campaigns per pass
+LEASE_TIMEOUT = 300  # seconds before a claimed but unfinished job is retried
+POLL_INTERVAL = 0.5
+
+# UPI handle -> payment service provider
+UPI_PSP = {
+    "ybl": "PhonePe", "ibl": "PhonePe", "axl": "PhonePe",
+    "okaxis": "Google Pay", "okhdfcbank": "Google Pay", "okicici": "Google Pay", "oksbi": "Google Pay",
+    "paytm": "Paytm", "ptyes": "Paytm", "ptaxis": "Paytm", "pthdfc": "Paytm", "ptsbi": "Paytm",
+    "apl": "Amazon Pay", "yapl": "Amazon Pay", "rapl": "Amazon Pay",
+    "upi": "BHIM", "axisbank": "Axis Bank", "icici": "ICICI Bank", "sbi": "SBI", "hdfcbank": "HDFC Bank",
+}
+
+# Second-level suffixes where the registered domain has three labels (e.g. example.co.in)
+MULTI_LABEL_SUFFIXES = {"co.in", "net.in", "org.in", "gov.in", "ac.in", "co.uk", "org.uk", "com.au"}
+
+
+# --- Enrichment Stages ---
+
+def canonicalize_url(url: str) -> str:
+    """
+    Lower-cases scheme/host, drops default ports, fragments and trailing slashes.
+    Links that urllib can't parse (bad port, broken IPv6 netloc) are returned as-is.
+    """
+    raw = url.strip()
+    if "://" not in raw:
+        raw = "http://" + raw
+    try:
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def registered_domain(host: str) -> str:
+    labels = host.lower().split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def enrich(indicator: Dict) -> Dict:
+    """Adds canonical value and grouping keys (domain / PSP) to a raw indicator."""
+    kind, value = indicator["type"], indicator["value"]
+    if not isinstance(value, str):
+        raise TypeError(f"{kind} value must be a string, got {type(value).__name__}")
+    enriched = dict(indicator)
+    if kind == "LINK":
+        canonical = canonicalize_url(value)
+        enriched["canonical"] = canonical
+        try:
+            host = urlsplit(canonical).hostname or ""
+        except ValueError:
+            host = ""
+        enriched["domain"] = registered_domain(host)
+        enriched["group"] = enriched["domain"]
+    elif kind == "UPI":
+        canonical = value.strip().lower()
+        enriched["canonical"] = canonical
+        enriched["psp"] = UPI_PSP.get(canonical.rsplit("@", 1)[-1], "Unknown")
+        enriched["group"] = enriched["psp"]
+    else:
+        enriched["canonical"] = " ".join(value.split()).upper()
+        enriched["group"] = "BANK"
+    return enriched
+
+
+def indicators_from_intel(intel: Dict, source: str) -> List[Dict]:
+    """Flattens an extracted_intelligence dict into individual indicators."""
+    indicators = []
+    if intel.get("upi_id"):
+        indicators.append({"type": "UPI", "value": intel["upi_id"], "source": source})
+    if intel.get("bank_details"):
+        indicators.append({"type": "BANK", "value": intel["bank_details"], "source": source})
+    for link in intel.get("phishing_links") or []:
+        indicators.append({"type": "LINK", "value": link, "source": source})
+    return indicators
+
+
+def idempotency_key(indicator: Dict) -> str:
+    # Keyed on the canonical form so trivially different spellings dedupe
+    canonical = enrich(indicator)["canonical"]
+    return hashlib.sha1(f"{indicator['type']}:{canonical}".encode("utf-8")).hexdigest()
+
+
+def cluster_key(enriched: Dict) -> str:
+    # PSPs are shared by everyone, so UPI/bank cluster on the exact value
+    return "ind:" + (enriched["domain"] if enriched["type"] == "LINK" else enriched["canonical"])
+
+
+# --- Export Sinks ---
+
+# Every exported record carries its own `idempotency_key` (stable per indicator);
+# that is the dedupe key for sinks. A retried batch keeps its batch key too.
+
+class FileSink:
+    """Appends exported batches to a local JSON lines file (no dedupe: use idempotency_key downstream)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, batch_key: str, records: List[Dict]):
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps(dict(record, batch=batch_key)) + "\n")
+
+
+class HttpSink:
+    """POSTs exported batches to a reporting endpoint."""
+
+    def __init__(self, url: str, timeout: int = 30):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def export(self, batch_key: str, records: List[Dict]):
+        resp = self.session.post(
+            self.url,
+            json={"batch": batch_key, "indicators": records},
+            headers={"Idempotency-Key": batch_key},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+
+
+def sink_from_env():
+    target = os.getenv("INTEL_SINK", "file:intel_export.jsonl")
+    if target.startswith(("http://", "https://")):
+        return HttpSink(target)
+    return FileSink(target[len("file:"):] if target.startswith("file:") else target)
+
+
+# --- Pipeline ---
+
+class IntelPipeline:
+    """
+    Persistent (SQLite) job queue for enriching and exporting indicators.
+
+    `submit` writes indicators straight to the queue (deduplicated by
+    idempotency key), so they survive a crash once it returns; callers on an
+    event loop should run it off-loop. Every (indicator, source) sighting is
+    recorded separately from export dedupe and folded into campaigns. A
+    background thread enriches due jobs in batches, exports them to the sink
+    and retries failures with capped backoff.
+    """
+
+    def __init__(self, db_path: str, sink=None, batch_size: int = BATCH_SIZE):
+        self.db_path = db_path
+        self.sink = sink if sink is not None else sink_from_env()
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._worker_id = f"{os.getpid()}-{id(self)}"
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    claimed_by TEXT,
+                    claimed_at REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at);
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    group_key TEXT PRIMARY KEY,
+                    campaign_id TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS campaigns_id ON campaigns (campaign_id);
+                CREATE TABLE IF NOT EXISTS sightings (
+                    cluster_key TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    clustered INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (cluster_key, source)
+                );
+                CREATE INDEX IF NOT EXISTS sightings_pending ON sightings (clustered);
+            """)
+            # Queues created before batch keys were pinned to their jobs
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "batch_key" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN batch_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_key)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # -- Producer side --
+
+    def submit(self, indicators: List[Dict]) -> int:
+        """
+        Persists indicators as jobs and sightings in one transaction. Returns
+        how many jobs were actually queued: new indicators, plus previously
+        failed ones that are revived. Indicators that can't be keyed are
+        stored as failed.
+        """
+        now = time.time()
+        rows, invalid, sightings = [], [], []
+        for indicator in indicators:
+            payload = json.dumps(indicator, default=str)
+            try:
+                rows.append((idempotency_key(indicator), payload, now))
+                sightings.append((cluster_key(enrich(indicator)), str(indicator.get("source"))))
+            except Exception as e:
+                # Keep a trace of malformed input instead of dropping it (or its neighbours)
+                key = "invalid:" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+                invalid.append((key, payload, f"{type(e).__name__}: {e}"[:500], now))
+        if not rows and not invalid:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT INTO jobs (idempotency_key, payload, created_at) VALUES (?, ?, ?)
+                    ON CONFLICT (idempotency_key) DO UPDATE SET
+                        status = 'pending', attempts = 0, next_attempt_at = 0,
+                        batch_key = NULL, last_error = NULL
+                    WHERE jobs.status = 'failed'
+                    """,
+                    rows,
+                )
+                queued = conn.total_changes - before
+                conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (idempotency_key, payload, status, last_error, created_at) "
+                    "VALUES (?, ?, 'failed', ?, ?)",
+                    invalid,
+                )
+                conn.executemany("INSERT OR IGNORE INTO sightings (cluster_key, source) VALUES (?, ?)", sightings)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return queued
+
+    # -- Worker side --
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="intel-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while not self._stop.is_set():
+                try:
+                    processed = self.process_batch(conn)
+                except Exception as e:
+                    print(f"[INTEL PIPELINE ERROR]: {e}")
+                    processed = 0
+                if not processed:
+                    self._stop.wait(POLL_INTERVAL)
+        finally:
+            conn.close()
+
+    def _claim(self, conn: sqlite3.Connection):
+        """
+        Claims one batch. A batch that was tried before is retried with exactly
+        the same jobs and batch key; otherwise a new batch is formed and keyed.
+        Returns (batch_key, rows).
+        """
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            retry = conn.execute(
+                """
+                SELECT batch_key FROM jobs
+                WHERE batch_key IS NOT NULL
+                  AND ((status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'running' AND claimed_at <= ?))
+                LIMIT 1
+                """,
+                (now, now - LEASE_TIMEOUT),
+            ).fetchone()
+            if retry:
+                batch_key = retry[0]
+                rows = conn.execute(
+                    "SELECT id, idempotency_key, payload, attempts FROM jobs "
+                    "WHERE batch_key = ? AND status IN ('pending', 'running') ORDER BY id",
+                    (batch_key,),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT id, idempotency_key, payload, attempts FROM jobs
+                    WHERE batch_key IS NULL
+                      AND ((status = 'pending' AND next_attempt_at <= ?)
+                           OR (status = 'running' AND claimed_at <= ?))
+                    ORDER BY id LIMIT ?
+                    """,
+                    (now, now - LEASE_TIMEOUT, self.batch_size),
+                ).fetchall()
+                batch_key = hashlib.sha1(",".join(row[1] for row in rows).encode("utf-8")).hexdigest()
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', batch_key = ?, claimed_by = ?, claimed_at = ? WHERE id = ?",
+                [(batch_key, self._worker_id, now, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return batch_key, rows
+
+    def _cluster_sightings(self, conn: sqlite3.Connection) -> int:
+        """
+        Campaign clustering: indicators sharing a scammer session (source), a
+        phishing domain, or the same UPI ID / bank account belong to the same
+        campaign. Folds new sightings into the campaigns table; when a sighting
+        bridges two known campaigns they are merged into the smaller id.
+        Records exported earlier keep the campaign id they were exported with;
+        the campaigns table holds the current mapping. Returns sightings folded.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            sightings = conn.execute(
+                "SELECT rowid, cluster_key, source FROM sightings WHERE clustered = 0 LIMIT ?",
+                (CLUSTER_BATCH_SIZE,),
+            ).fetchall()
+            if not sightings:
+                conn.execute("COMMIT")
+                return 0
+
+            parent: Dict[str, str] = {}
+
+            def find(x):
+                parent.setdefault(x, x)
+                while parent[x] != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            def union(a, b):
+                parent[find(a)] = find(b)
+
+            for _, key, source in sightings:
+                union(f"src:{source}", key)
+
+            known = {}
+            all_keys = list(parent)
+            for i in range(0, len(all_keys), 500):
+                chunk = all_keys[i:i + 500]
+                known.update(conn.execute(
+                    f"SELECT group_key, campaign_id FROM campaigns WHERE group_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall())
+
+            clusters: Dict[str, List[str]] = {}
+            for key in parent:
+                clusters.setdefault(find(key), []).append(key)
+
+            merges, inserts = [], []
+            for keys in clusters.values():
+                existing = sorted({known[k] for k in keys if k in known})
+                campaign_id = existing[0] if existing else "cmp-" + hashlib.sha1(min(keys).encode("utf-8")).hexdigest()[:12]
+                merges.extend((campaign_id, old) for old in existing[1:])
+                inserts.extend((key, campaign_id) for key in keys if key not in known)
+            conn.executemany("UPDATE campaigns SET campaign_id = ? WHERE campaign_id = ?", merges)
+            conn.executemany("INSERT INTO campaigns (group_key, campaign_id) VALUES (?, ?)", inserts)
+            conn.executemany("UPDATE sightings SET clustered = 1 WHERE rowid = ?", [(row[0],) for row in sightings])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(sightings)
+
+    def _campaign_ids(self, conn: sqlite3.Connection, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        unique = list(set(keys))
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            found.update(conn.execute(
+                f"SELECT group_key, campaign_id FROM campaigns WHERE group_key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall())
+        return found
+
+    def process_batch(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Folds new sightings into campaigns, then claims, enriches and exports
+        one batch of due jobs. Returns the amount of work done.
+        """
+        own_conn = conn is None
+        conn = conn or self._connect()
+        try:
+            clustered = self._cluster_sightings(conn)
+            batch_key, rows = self._claim(conn)
+            if not rows:
+                return clustered
+            records, exported_rows, bad = [], [], []
+            for row in rows:
+                job_id, key, payload, _ = row
+                try:
+                    record = enrich(json.loads(payload))
+                except Exception as e:
+                    bad.append(("failed", f"{type(e).__name__}: {e}"[:500], job_id))
+                    continue
+                record["idempotency_key"] = key
+                records.append(record)
+                exported_rows.append(row)
+            if bad:
+                conn.executemany("UPDATE jobs SET status = ?, last_error = ? WHERE id = ?", bad)
+            if not records:
+                return clustered + len(rows)
+            campaign_of = self._campaign_ids(conn, [cluster_key(r) for r in records])
+            for record in records:
+                record["campaign_id"] = campaign_of.get(cluster_key(record))
+            try:
+                self.sink.export(batch_key, records)
+            except Exception as e:
+                self._fail(conn, exported_rows, str(e))
+                return clustered + len(rows)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE jobs SET status = 'done', attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                    [(row[0],) for row in exported_rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return clustered + len(rows)
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _fail(self, conn: sqlite3.Connection, rows: List, error: str):
+        # Sink outages are never terminal: back off (capped) and keep retrying
+        print(f"[INTEL EXPORT ERROR]: {error}")
+        now = time.time()
+        updates = []
+        for job_id, _, _, attempts in rows:
+            attempts += 1
+            delay = min(RETRY_BASE_DELAY * 2 ** min(attempts - 1, 30), MAX_RETRY_DELAY)
+            updates.append((attempts, now + delay, error[:500], job_id))
+        conn.executemany(
+            "UPDATE jobs SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            updates,
+        )
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            campaigns = conn.execute("SELECT COUNT(DISTINCT campaign_id) FROM campaigns").fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "campaigns": campaigns,
+        }
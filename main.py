@@ -1,12 +1,14 @@
 import os
 import typing
+import asyncio
 from collections import defaultdict
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-import google.generativeai as genai
+from contextlib import asynccontextmanager
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +26,23 @@ if not BACKEND_SECRET:
 
 # genai.configure(api_key=API_KEY) # No longer needed for OpenRouter via OpenAI client
 
-app = FastAPI()
+def log_warm_up_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        print(f"Agent warm-up failed (clients will be built on first use): {task.exception()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each worker after fork: build API clients here rather than at import,
+    # so the gunicorn master (--preload) never holds connection pools.
+    # Warmed in the background so the worker starts serving immediately.
+    warm_up = asyncio.create_task(run_in_threadpool(graph.warm_up))
+    warm_up.add_done_callback(log_warm_up_failure)
+    intel_pipeline.start()
+    yield
+    intel_pipeline.stop()
+    await asyncio.gather(warm_up, return_exceptions=True)
+
+app = FastAPI(lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 app.add_middleware(
@@ -55,15 +73,35 @@ turn_counts: typing.Dict[str, int] = defaultdict(int)
 # Each item: {timestamp, client_id, message, reply, extracted_intelligence, scam_detected}
 global_interactions: typing.List[typing.Dict] = []
 
+# --- Sharded Deployment ---
+# With SHARD_NODES/SHARD_ID set, each process owns a slice of the session keyspace
+# and keeps only that slice's state (see sharding.py). Otherwise router is None.
+from sharding import router_from_env, merge_aggregates, CLUSTER_INTERACTIONS_LIMIT, ShardUnavailable
+
+router = router_from_env()
+RESULTS_FILE = f"results-{router.shard_name}.json" if router else "results.json"
+
+# --- Intel Enrichment / Export Pipeline ---
+# Persistent job queue (see intel_pipeline.py). Indicators are written to it in
+# a background task after the response is sent, so the request path never waits
+# on the queue, enrichment or export.
+from intel_pipeline import IntelPipeline, indicators_from_intel
+
+INTEL_QUEUE_DB = f"intel_queue-{router.shard_name}.db" if router else "intel_queue.db"
+intel_pipeline = IntelPipeline(INTEL_QUEUE_DB)
+
 # Load persistence on startup
-# Load persistence on startup
+# Runs at import, so under `gunicorn --preload` the log is replayed once in the
+# master and the restored history is shared copy-on-write with every worker.
 import json
 import os
 import time
 
-if os.path.exists("results.json"):
+def load_persistence():
+    if not os.path.exists(RESULTS_FILE):
+        return
     try:
-        with open("results.json", "r") as f:
+        with open(RESULTS_FILE, "r") as f:
             for line in f:
                 if line.strip():
                     try:
@@ -86,6 +124,8 @@ if os.path.exists("results.json"):
     except Exception as e:
         print(f"Error loading persistence: {e}")
 
+load_persistence()
+
 # Better approach: Modify 'global_interactions' to be populated from a persistent log if possible.
 # For this hackathon, we'll just ensure the Intel Table populates.
 # Actually, let's make results.json store the FULL interaction so we can restore the feed too.
@@ -132,12 +172,14 @@ class HoneypotResponse(BaseModel):
 MODEL_NAME = "gemini-2.5-flash" 
 
 # --- State Graph Config ---
+# Cheap to construct: agents only import the OpenAI SDK and build clients on
+# first use (or in the lifespan hook above).
 from state_graph import StateGraph
 
 graph = StateGraph(api_key=API_KEY)
 
 @app.post("/guvi-honeypot", response_model=HoneypotResponse)
-async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest):
+async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest, background_tasks: BackgroundTasks):
     """
     Honeypot endpoint to analyze potential scam messages.
     """
@@ -147,8 +189,21 @@ async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest):
     #     if req_token != BACKEND_SECRET:
     #         raise HTTPException(status_code=401, detail="Unauthorized: Invalid x-api-key header")
 
-    # Track turns based on client_id (if provided) or client IP
-    tracker_key = body.client_id if body.client_id else (request.client.host if request.client else "unknown")
+    # Track turns based on client_id / sessionId (if provided) or client IP
+    tracker_key = body.client_id or body.sessionId or (request.client.host if request.client else "unknown")
+
+    # Session affinity: hand the request to the shard owning this session
+    # (only requests signed by a peer with SHARD_SECRET skip routing)
+    if router and not router.is_local(tracker_key) and not router.is_forwarded(request.headers, await request.body()):
+        payload = body.dict()
+        payload["client_id"] = tracker_key  # Keep the IP-derived key stable across the hop
+        owner = router.owner(tracker_key)
+        try:
+            status_code, content = await run_in_threadpool(router.forward_json, owner, "/guvi-honeypot", payload)
+            return JSONResponse(status_code=status_code, content=content)
+        except ShardUnavailable as e:
+            # Degraded mode: keep answering the scammer from this shard
+            print(f"Owner shard down, handling {tracker_key} locally: {e}")
     
     turn_counts[tracker_key] += 1
     current_turn_count = turn_counts[tracker_key]
@@ -166,8 +221,8 @@ async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest):
     else:
         message_text = "Hello"
     
-    # Run the State Graph
-    state = graph.run(message_text, history)
+    # Run the State Graph (blocking model calls, kept off the event loop)
+    state = await run_in_threadpool(graph.run, message_text, history)
     
     # Store interaction in global history
     import datetime
@@ -197,10 +252,13 @@ async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest):
             "intel": state.extracted_intel
         }
         try:
-            with open("results.json", "a") as f:
+            with open(RESULTS_FILE, "a") as f:
                 f.write(json.dumps(record) + "\n")
         except Exception as e:
-            print(f"Error saving to results.json: {e}")
+            print(f"Error saving to {RESULTS_FILE}: {e}")
+
+        # Hand newly seen indicators to the enrichment pipeline (after the response)
+        background_tasks.add_task(intel_pipeline.submit, indicators_from_intel(state.extracted_intel, tracker_key))
 
     # Construct the final response
     return HoneypotResponse(
@@ -212,49 +270,168 @@ async def guvi_honeypot_endpoint(request: Request, body: HoneypotRequest):
         )
     )
 
+def build_intel_feed(interactions: typing.List[typing.Dict]) -> typing.List[typing.Dict]:
+    """Flattens extracted intelligence into rows for the database table."""
+    intel_feed = []
+    for interaction in interactions:
+        intel = interaction.get("extracted_intelligence", {})
+        if intel.get("upi_id"):
+            intel_feed.append({"type": "UPI", "value": intel["upi_id"], "source": interaction["client_id"]})
+        if intel.get("bank_details"):
+            intel_feed.append({"type": "BANK", "value": intel["bank_details"], "source": interaction["client_id"]})
+        for link in intel.get("phishing_links", []):
+            intel_feed.append({"type": "LINK", "value": link, "source": interaction["client_id"]})
+    return intel_feed
+
+AGGREGATE_FIELDS = ("interactions", "turn_counts", "intel", "total_flagged_upis")
+
+def local_aggregate(fields: typing.Iterable[str] = AGGREGATE_FIELDS, limit: typing.Optional[int] = None) -> typing.Dict:
+    """Aggregates held by this process (one shard in sharded mode), restricted to `fields`."""
+    agg = {}
+    if "interactions" in fields:
+        agg["interactions"] = global_interactions[:limit] if limit is not None else global_interactions
+    if "turn_counts" in fields:
+        agg["turn_counts"] = turn_counts
+    if "intel" in fields:
+        agg["intel"] = build_intel_feed(global_interactions)
+    if "total_flagged_upis" in fields:
+        agg["total_flagged_upis"] = sum(1 for i in global_interactions if i.get("extracted_intelligence", {}).get("upi_id"))
+    return agg
+
+async def cluster_aggregate(fields: typing.Iterable[str] = AGGREGATE_FIELDS) -> typing.Dict:
+    """Cluster-wide view: merges the requested fields from every reachable shard."""
+    if not router:
+        return local_aggregate(fields)
+    # Each shard sends at most its newest CLUSTER_INTERACTIONS_LIMIT interactions
+    params = {"fields": ",".join(fields), "limit": CLUSTER_INTERACTIONS_LIMIT}
+    remote_nodes = [n for n in router.nodes if n != router.self_node]
+    remote = await asyncio.gather(*[
+        run_in_threadpool(router.fetch, node, "/api/shard/aggregate", params) for node in remote_nodes
+    ])
+    local = local_aggregate(fields, CLUSTER_INTERACTIONS_LIMIT)
+    missing = [node for node, agg in zip(remote_nodes, remote) if agg is None]
+    return merge_aggregates([local] + [agg for agg in remote if agg is not None], CLUSTER_INTERACTIONS_LIMIT, missing)
+
+def cluster_info(agg: typing.Dict) -> typing.Dict:
+    """Which shards a (possibly partial) cluster view was built from."""
+    return {"shards": agg.get("shards", 1), "missing_shards": agg.get("missing_shards", [])}
+
+def set_cluster_headers(response: Response, agg: typing.Dict):
+    # List endpoints keep their body shape for the dashboard; flag partial views in headers
+    info = cluster_info(agg)
+    response.headers["X-Cluster-Shards"] = str(info["shards"])
+    response.headers["X-Cluster-Missing"] = ",".join(info["missing_shards"])
+
+@app.get("/api/shard/aggregate")
+async def get_shard_aggregate(fields: str = ",".join(AGGREGATE_FIELDS), limit: typing.Optional[int] = None):
+    """
+    Returns this shard's own aggregates (used by peers to build cluster views).
+    """
+    return local_aggregate([f for f in fields.split(",") if f], limit)
+
 @app.get("/stats")
 async def get_stats():
+    agg = await cluster_aggregate(("interactions", "turn_counts"))
     return {
-        "interactions": global_interactions,
-        "turn_counts": turn_counts
+        "interactions": agg["interactions"],
+        "turn_counts": agg["turn_counts"],
+        "cluster": cluster_info(agg)
     }
 
 @app.get("/api/logs")
-async def get_logs():
-    return global_interactions
+async def get_logs(response: Response):
+    agg = await cluster_aggregate(("interactions",))
+    set_cluster_headers(response, agg)
+    return agg["interactions"]
 
 @app.get("/api/metrics")
 async def get_metrics():
+    agg = await cluster_aggregate(("turn_counts", "total_flagged_upis"))
     return {
-        "turn_counts": turn_counts,
-        "total_scammers": len(turn_counts),
-        "total_flagged_upis": sum(1 for i in global_interactions if i.get("extracted_intelligence", {}).get("upi_id"))
+        "turn_counts": agg["turn_counts"],
+        "total_scammers": len(agg["turn_counts"]),
+        "total_flagged_upis": agg["total_flagged_upis"],
+        "cluster": cluster_info(agg)
     }
 
 @app.get("/api/intel")
-async def get_intel():
+async def get_intel(response: Response):
     """
     Returns a unified list of extracted intelligence for the database table.
     """
-    intel_feed = []
+    agg = await cluster_aggregate(("intel",))
+    set_cluster_headers(response, agg)
+    return agg["intel"]
+
+async def queue_local_report() -> int:
+    """
+    Queues every indicator held by this process. Returns how many jobs were
+    actually queued (already exported duplicates are not counted).
+    """
+    indicators = []
     for interaction in global_interactions:
-        intel = interaction.get("extracted_intelligence", {})
-        if intel.get("upi_id"):
-            intel_feed.append({"type": "UPI", "value": intel["upi_id"], "source": interaction["client_id"]})
-        if intel.get("bank_details"):
-            intel_feed.append({"type": "BANK", "value": intel["bank_details"], "source": interaction["client_id"]})
-        for link in intel.get("phishing_links", []):
-            intel_feed.append({"type": "LINK", "value": link, "source": interaction["client_id"]})
-    return intel_feed
+        indicators.extend(indicators_from_intel(interaction.get("extracted_intelligence", {}), interaction["client_id"]))
+    return await run_in_threadpool(intel_pipeline.submit, indicators)
+
+@app.post("/api/shard/report")
+async def report_shard():
+    """
+    Queues this shard's indicators for export (used by /api/report in sharded mode).
+    """
+    return {"queued": await queue_local_report()}
 
 @app.post("/api/report")
 async def report_scam():
     """
-    Mock endpoint to report data to NPCI.
+    Queues all extracted intelligence for enrichment and export to the configured
+    sink (INTEL_SINK). Returns once the jobs are persisted, without waiting on
+    enrichment or export; track progress via /api/report/status.
+    """
+    queued = await queue_local_report()
+    if router:
+        remote_nodes = [n for n in router.nodes if n != router.self_node]
+        responses = await asyncio.gather(*[
+            run_in_threadpool(router.forward, node, "/api/shard/report", {}) for node in remote_nodes
+        ], return_exceptions=True)
+        for node, resp in zip(remote_nodes, responses):
+            if isinstance(resp, Exception) or not resp.ok:
+                print(f"Shard {node} report failed: {resp}")
+            else:
+                queued += resp.json().get("queued", 0)
+    return {
+        "status": "success",
+        "message": f"Success: {queued} indicators queued for National Cyber Crime Cell",
+        "queued": queued
+    }
+
+@app.get("/api/shard/report/status")
+async def report_shard_status():
+    """
+    Returns job counts of this shard's intel export pipeline.
+    """
+    return await run_in_threadpool(intel_pipeline.stats)
+
+@app.get("/api/report/status")
+async def report_status():
+    """
+    Returns job counts of the intel export pipeline, summed across shards.
     """
-    import asyncio
-    await asyncio.sleep(1) # Simulate API latency
-    return {"status": "success", "message": "Success: Reported to National Cyber Crime Cell"}
+    stats = await run_in_threadpool(intel_pipeline.stats)
+    if not router:
+        return stats
+    remote_nodes = [n for n in router.nodes if n != router.self_node]
+    remote = await asyncio.gather(*[
+        run_in_threadpool(router.fetch, node, "/api/shard/report/status") for node in remote_nodes
+    ])
+    # Campaigns are clustered per shard, so their sum is an upper bound
+    for shard_stats in remote:
+        for field, count in (shard_stats or {}).items():
+            stats[field] = stats.get(field, 0) + count
+    stats["cluster"] = {
+        "shards": 1 + sum(1 for s in remote if s is not None),
+        "missing_shards": [node for node, s in zip(remote_nodes, remote) if s is None],
+    }
+    return stats
 
 @app.get("/")
 async def root():
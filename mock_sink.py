@@ -0,0 +1,42 @@
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the reporting API. Point the pipeline at it with
+#   INTEL_SINK=http://127.0.0.1:8300/report
+# Batches are deduplicated on the Idempotency-Key header, and indicators on their
+# per-record idempotency_key (the stable dedupe key), like a real sink would.
+
+seen_batches = set()
+seen_indicators = set()
+indicator_count = 0
+
+class SinkHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        global indicator_count
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        key = self.headers.get("Idempotency-Key")
+        duplicate = key in seen_batches
+        seen_batches.add(key)
+        new = 0
+        for indicator in body.get("indicators", []):
+            if indicator.get("idempotency_key") not in seen_indicators:
+                seen_indicators.add(indicator.get("idempotency_key"))
+                new += 1
+        indicator_count += new
+        print(f"Batch {key}: {len(body.get('indicators', []))} indicators, {new} new"
+              f"{' (duplicate batch)' if duplicate else ''}, total {indicator_count}")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps({"status": "accepted", "duplicate": duplicate}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock intel export sink")
+    parser.add_argument("--port", type=int, default=8300)
+    args = parser.parse_args()
+    print(f"--- Mock sink listening on :{args.port} ---")
+    ThreadingHTTPServer(("0.0.0.0", args.port), SinkHandler).serve_forever()
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import secrets
+import argparse
+import subprocess
+
+# Launches a local sharded cluster: one single-worker uvicorn process per shard.
+# Every process gets the same SHARD_NODES list and its own SHARD_ID, so sessions
+# are routed to their owner no matter which port the client talks to.
+
+def start_cluster(shards: int, base_port: int, host: str = "127.0.0.1"):
+    nodes = [f"http://{host}:{base_port + i}" for i in range(shards)]
+    # Shards sign forwarded requests with a shared secret; make one up for local runs
+    secret = os.getenv("SHARD_SECRET") or secrets.token_hex(16)
+    procs = []
+    for i in range(shards):
+        env = dict(os.environ, SHARD_NODES=",".join(nodes), SHARD_ID=str(i), SHARD_SECRET=secret)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app",
+             "--host", "0.0.0.0", "--port", str(base_port + i)],
+            env=env,
+        ))
+    return nodes, procs
+
+def stop_cluster(procs):
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        p.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local sharded honeypot cluster")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=8000)
+    args = parser.parse_args()
+
+    nodes, procs = start_cluster(args.shards, args.base_port)
+    print(f"--- Cluster up: {', '.join(nodes)} ---")
+    try:
+        while all(p.poll() is None for p in procs):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cluster(procs)
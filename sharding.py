@@ -0,0 +1,181 @@
+import os
+import hmac
+import json
+import time
+import bisect
+import hashlib
+from typing import Dict, List, Optional
+
+# --- Sharding Configuration ---
+# SHARD_NODES: comma separated base URLs of every shard in the cluster,
+#   e.g. "http://10.0.0.1:8000,http://10.0.0.2:8000"
+# SHARD_ID: this process' own entry in SHARD_NODES (full URL or 0-based index)
+# SHARD_SECRET: shared by all shards; signs forwarded requests
+# Leaving SHARD_NODES empty keeps the original single-node behaviour.
+VIRTUAL_NODES = 128
+FORWARD_HEADER = "x-shard-forwarded"
+SIGNATURE_HEADER = "x-shard-signature"
+# Forwarded signatures older than this (seconds) are rejected
+SIGNATURE_MAX_AGE = 120
+FORWARD_TIMEOUT = 60
+# Dashboard fan-out reads: a hung shard must not stall every poll
+FETCH_TIMEOUT = 3
+# Most recent interactions each shard contributes to a cluster-wide feed
+CLUSTER_INTERACTIONS_LIMIT = 500
+
+
+class ShardUnavailable(Exception):
+    """Raised when the owning shard cannot be reached or returns garbage."""
+
+
+class HashRing:
+    """Consistent hash ring mapping session keys to shard nodes."""
+
+    def __init__(self, nodes: List[str], virtual_nodes: int = VIRTUAL_NODES):
+        self.nodes = list(nodes)
+        self._ring: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in self.nodes:
+            for i in range(virtual_nodes):
+                point = self._hash(f"{node}#{i}")
+                self._owners[point] = node
+                self._ring.append(point)
+        self._ring.sort()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+    def owner(self, key: str) -> str:
+        """Returns the node owning the given key."""
+        idx = bisect.bisect(self._ring, self._hash(key)) % len(self._ring)
+        return self._owners[self._ring[idx]]
+
+
+class ShardRouter:
+    """Routes sessions to their owning shard and fans out cluster-wide reads."""
+
+    def __init__(self, nodes: List[str], self_node: str, secret: str):
+        self.nodes = [n.rstrip("/") for n in nodes]
+        self.self_node = self_node.rstrip("/")
+        if self.self_node not in self.nodes:
+            raise RuntimeError(f"SHARD_ID {self_node} is not listed in SHARD_NODES")
+        self.secret = secret.encode("utf-8")
+        self.ring = HashRing(self.nodes)
+        import requests  # Only needed once sharding is enabled
+        self.session = requests.Session()
+
+    @property
+    def shard_name(self) -> str:
+        # Derived from the node URL, not its position, so adding nodes to
+        # SHARD_NODES never renames another shard's state files
+        return "shard-" + hashlib.sha1(self.self_node.encode("utf-8")).hexdigest()[:10]
+
+    def owner(self, key: str) -> str:
+        return self.ring.owner(key)
+
+    def is_local(self, key: str) -> bool:
+        return self.owner(key) == self.self_node
+
+    def _sign(self, sender: str, timestamp: str, body: bytes) -> str:
+        message = sender.encode("utf-8") + b"." + timestamp.encode("utf-8") + b"." + body
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def is_forwarded(self, headers, body: bytes) -> bool:
+        """True only for requests signed by a cluster member with SHARD_SECRET."""
+        sender = headers.get(FORWARD_HEADER)
+        signature = headers.get(SIGNATURE_HEADER, "")
+        timestamp, _, digest = signature.partition(":")
+        if not sender or sender.rstrip("/") not in self.nodes or not digest:
+            return False
+        try:
+            if abs(time.time() - float(timestamp)) > SIGNATURE_MAX_AGE:
+                return False
+        except ValueError:
+            return False
+        return hmac.compare_digest(digest, self._sign(sender, timestamp, body))
+
+    def forward(self, node: str, path: str, payload: Dict):
+        """Forwards a signed request to the shard that owns the session."""
+        body = json.dumps(payload).encode("utf-8")
+        timestamp = str(time.time())
+        return self.session.post(
+            f"{node}{path}",
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                FORWARD_HEADER: self.self_node,
+                SIGNATURE_HEADER: f"{timestamp}:{self._sign(self.self_node, timestamp, body)}",
+            },
+            timeout=FORWARD_TIMEOUT,
+        )
+
+    def forward_json(self, node: str, path: str, payload: Dict):
+        """Forwards a request and returns (status_code, json body); raises ShardUnavailable."""
+        import requests
+        try:
+            resp = self.forward(node, path, payload)
+            return resp.status_code, resp.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ShardUnavailable(f"{node}: {e}") from e
+
+    def fetch(self, node: str, path: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """Fetches a per-shard aggregate; returns None if the shard is unreachable."""
+        try:
+            resp = self.session.get(f"{node}{path}", params=params, timeout=FETCH_TIMEOUT)
+            resp.raise_for_status()
+            return resp.json()
+        except Exception as e:
+            print(f"Shard {node} unavailable: {e}")
+            return None
+
+
+def router_from_env() -> Optional[ShardRouter]:
+    """Builds a ShardRouter from SHARD_NODES / SHARD_ID, or None when sharding is off."""
+    nodes = [n.strip() for n in os.getenv("SHARD_NODES", "").split(",") if n.strip()]
+    if not nodes:
+        return None
+    shard_id = os.getenv("SHARD_ID", "").strip()
+    if not shard_id:
+        raise RuntimeError("SHARD_NODES is set but SHARD_ID is missing")
+    secret = os.getenv("SHARD_SECRET", "")
+    if not secret:
+        raise RuntimeError("SHARD_NODES is set but SHARD_SECRET is missing")
+    self_node = nodes[int(shard_id)] if shard_id.isdigit() else shard_id
+    return ShardRouter(nodes, self_node, secret)
+
+
+def _interaction_sort_key(interaction: Dict):
+    ts = str(interaction.get("timestamp", ""))
+    return (ts[:1].isdigit(), ts if ts[:1].isdigit() else "")
+
+
+def merge_aggregates(aggregates: List[Dict], limit: Optional[int] = None,
+                     missing: Optional[List[str]] = None) -> Dict:
+    """
+    Merges per-shard aggregates into a single cluster-wide view. `missing`
+    lists shards that didn't answer, so partial views are labelled as such.
+    """
+    interactions: List[Dict] = []
+    turn_counts: Dict[str, int] = {}
+    intel: List[Dict] = []
+    total_flagged_upis = 0
+    for agg in aggregates:
+        interactions.extend(agg.get("interactions", []))
+        # Sessions are shard-affine, so keys never collide; sum defensively anyway
+        for key, count in agg.get("turn_counts", {}).items():
+            turn_counts[key] = turn_counts.get(key, 0) + count
+        intel.extend(agg.get("intel", []))
+        total_flagged_upis += agg.get("total_flagged_upis", 0)
+    # Newest live (ISO timestamp) interactions first, restored history after
+    interactions.sort(key=_interaction_sort_key, reverse=True)
+    if limit is not None:
+        interactions = interactions[:limit]
+    return {
+        "interactions": interactions,
+        "turn_counts": turn_counts,
+        "intel": intel,
+        "total_flagged_upis": total_flagged_upis,
+        "shards": len(aggregates),
+        "missing_shards": list(missing or []),
+    }
@@ -19,6 +19,11 @@ class StateGraph:
         self.orchestrator = OrchestratorAgent(api_key)
         self.persona = PersonaAgent(api_key)
         self.extractor = ExtractionAgent(api_key)
+
+    def warm_up(self):
+        """Builds the agents' API clients ahead of the first request."""
+        for agent in (self.orchestrator, self.persona, self.extractor):
+            agent.client
     
     def run(self, message: str, history: List[Dict]) -> WorkflowState:
         # Initialize State
@@ -0,0 +1,57 @@
+import time
+import uuid
+import random
+import requests
+from run_cluster import start_cluster, stop_cluster
+
+# Spins up a local 3-shard cluster and checks session affinity + merged views.
+SHARDS = 3
+BASE_PORT = 8101
+
+def wait_until_ready(nodes, timeout=60):
+    deadline = time.time() + timeout
+    for node in nodes:
+        while True:
+            try:
+                requests.get(f"{node}/", timeout=1).raise_for_status()
+                break
+            except Exception:
+                if time.time() > deadline:
+                    raise RuntimeError(f"{node} did not start")
+                time.sleep(0.5)
+
+def run_cluster_test():
+    nodes, procs = start_cluster(SHARDS, BASE_PORT)
+    try:
+        wait_until_ready(nodes)
+        print(f"--- Cluster up: {', '.join(nodes)} ---")
+
+        client_ids = [str(uuid.uuid4()) for _ in range(6)]
+        ok = True
+        for turn in range(1, 4):
+            for client_id in client_ids:
+                # Hit a random node every turn; the owner must keep counting
+                node = random.choice(nodes)
+                resp = requests.post(f"{node}/guvi-honeypot", json={"message": "Hello madam", "client_id": client_id})
+                resp.raise_for_status()
+                count = resp.json()["engagement_metrics"]["turns_count"]
+                if count != turn:
+                    print(f"FAIL: {client_id} turn {turn} got count {count} via {node}")
+                    ok = False
+
+        # Every node must serve the same cluster-wide view
+        for node in nodes:
+            metrics = requests.get(f"{node}/api/metrics").json()
+            counts = {k: v for k, v in metrics["turn_counts"].items() if k in client_ids}
+            if counts != {c: 3 for c in client_ids}:
+                print(f"FAIL: {node} metrics mismatch: {counts}")
+                ok = False
+
+        owned = [len(requests.get(f"{n}/api/shard/aggregate").json()["turn_counts"]) for n in nodes]
+        print(f"Sessions per shard: {owned}")
+        print("\nSUCCESS: Sessions are shard-affine and views merge." if ok else "\nFAILED")
+    finally:
+        stop_cluster(procs)
+
+if __name__ == "__main__":
+    run_cluster_test()
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import tempfile
+import intel_pipeline
+from intel_pipeline import IntelPipeline, FileSink
+
+# Bulk-reporting check: pushes thousands of indicators through the pipeline
+# into a file sink and reports throughput, dedup and campaign clustering.
+INDICATORS = 5000
+# Scammer-controlled garbage must never take its neighbours down with it:
+# unparseable links are exported as-is, non-string values are stored as failed
+UNPARSEABLE_LINKS = [
+    {"type": "LINK", "value": "http://evil.com:99999/x", "source": "scammer-bad"},
+    {"type": "LINK", "value": "http://[::1", "source": "scammer-bad"},
+]
+INVALID = [{"type": "UPI", "value": ["not", "a", "string"], "source": "scammer-bad"}]
+EXPORTABLE = INDICATORS + len(UNPARSEABLE_LINKS)
+
+class FlakySink(FileSink):
+    """Fails the first export to exercise the retry path."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failed_batch = None
+        self.retried_batch = None
+
+    def export(self, batch_key, records):
+        keys = sorted(r["idempotency_key"] for r in records)
+        if self.failed_batch is None:
+            self.failed_batch = (batch_key, keys)
+            raise RuntimeError("simulated sink outage")
+        if batch_key == self.failed_batch[0]:
+            self.retried_batch = (batch_key, keys)
+        super().export(batch_key, records)
+
+def run_pipeline_test():
+    workdir = tempfile.mkdtemp()
+    export_path = os.path.join(workdir, "export.jsonl")
+    pipeline = IntelPipeline(os.path.join(workdir, "queue.db"), sink=FlakySink(export_path))
+
+    indicators = []
+    for i in range(INDICATORS // 2):
+        source = f"scammer-{i // 10}"
+        indicators.append({"type": "UPI", "value": f"fraud{i}@ybl", "source": source})
+        indicators.append({"type": "LINK", "value": f"HTTP://Www.KYC-{i // 10}.co.in:80/verify/{i}/#x", "source": source})
+    # Same indicators again: must be dropped by idempotency key
+    indicators.extend(indicators[:500])
+    indicators[1000:1000] = UNPARSEABLE_LINKS + INVALID
+
+    intel_pipeline.RETRY_BASE_DELAY = 0.1
+
+    start = time.perf_counter()
+    pipeline.start()
+    # Arrive in chunks so new jobs are queued while the failed batch waits to retry
+    for i in range(0, len(indicators), 250):
+        pipeline.submit(indicators[i:i + 250])
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        stats = pipeline.stats()
+        if stats["done"] + stats["failed"] >= EXPORTABLE + len(INVALID):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    with open(export_path) as f:
+        exported = [json.loads(line) for line in f]
+    print(f"Exported {len(exported)} indicators in {elapsed:.2f}s "
+          f"({len(exported) / elapsed * 60:.0f}/min), stats: {stats}")
+    print(f"Sample: {exported[1]}")
+    ok = (
+        len(exported) == EXPORTABLE
+        and len({r["idempotency_key"] for r in exported}) == EXPORTABLE
+        and stats["failed"] == len(INVALID)
+        and stats["campaigns"] == INDICATORS // 20 + 1
+        and pipeline.sink.retried_batch == pipeline.sink.failed_batch
+    )
+    print(f"Retried batch kept its key and contents: {pipeline.sink.retried_batch == pipeline.sink.failed_batch}")
+    print("\nSUCCESS: Pipeline enriched and exported every indicator once." if ok else "\nFAILED")
+
+if __name__ == "__main__":
+    run_pipeline_test()